@@ -5,7 +5,9 @@ MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from bson import ObjectId
+from bson.codec_options import CodecOptions, TypeDecoder, TypeRegistry
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
@@ -18,16 +20,25 @@ load_dotenv()
 _client = None
 db = None
 
+class ObjectIdStringCodec(TypeDecoder):
+    """Decode ObjectIds as hex strings so documents are JSON-ready"""
+    bson_type = ObjectId
+
+    def transform_bson(self, value):
+        return str(value)
+
+codec_options = CodecOptions(document_class=dict, type_registry=TypeRegistry([ObjectIdStringCodec()]))
+
 database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
 if database_url and database_name:
-    _client = MongoClient(database_url)
-    db = _client[database_name]
+    _client = AsyncIOMotorClient(database_url)
+    db = _client.get_database(database_name, codec_options=codec_options)
 
 # Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
-    """Insert a single document with timestamp"""
+async def create_document(collection_name: str, data: Union[BaseModel, dict], session=None):
+    """Insert a single document with timestamp, optionally inside a client session"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
 
@@ -40,16 +51,21 @@ def create_document(collection_name: str, data: Union[BaseModel, dict]):
     data_dict['created_at'] = datetime.now(timezone.utc)
     data_dict['updated_at'] = datetime.now(timezone.utc)
 
-    result = db[collection_name].insert_one(data_dict)
-    return str(result.inserted_id)
+    # Generate the id client-side so the hex form can be stored and indexed alongside it
+    object_id = data_dict.get('_id') or ObjectId()
+    data_dict['_id'] = object_id
+    data_dict['_id_str'] = str(object_id)
+
+    await db[collection_name].insert_one(data_dict, session=session)
+    return data_dict['_id_str']
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
-    """Get documents from collection"""
+async def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None, projection: dict = None):
+    """Get documents from collection, optionally returning only the projected fields"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
     
-    cursor = db[collection_name].find(filter_dict or {})
+    cursor = db[collection_name].find(filter_dict or {}, projection)
     if limit:
         cursor = cursor.limit(limit)
     
-    return list(cursor)
+    return await cursor.to_list(length=limit)
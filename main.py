@@ -1,13 +1,32 @@
 import os
+import re
+import asyncio
+import logging
+import hmac
+import hashlib
+import itertools
+import time
+import threading
 from typing import List, Optional
 from fastapi import FastAPI, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel, EmailStr
-from passlib.context import CryptContext
-import jwt
+import bcrypt
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
+from cachetools import LRUCache, TTLCache
+try:
+    # Rust-backed, PyJWT-compatible; only installed where it ships wheels (see requirements.txt)
+    import jwt_rs as jwt
+except ImportError:
+    import jwt
+import orjson
 from datetime import datetime, timedelta, timezone
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
 
 from database import db, create_document, get_documents
 from schemas import User, Listing, Application, Payment, Receipt
@@ -15,10 +34,55 @@ from schemas import User, Listing, Application, Payment, Receipt
 JWT_SECRET = os.getenv("JWT_SECRET", "devsecret")
 JWT_ALG = "HS256"
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+
+# New hashes use PWD_SCHEME; verification picks the scheme from the stored hash prefix
+PWD_SCHEME = os.getenv("PWD_SCHEME", "bcrypt")
+BCRYPT_ROUNDS = 12
+argon2_hasher = PasswordHasher(time_cost=2, memory_cost=65536)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-app = FastAPI(title="Takuezy Housing API")
+# Recent verify results, keyed by an HMAC of (password, hash) so no plaintext is kept.
+# verify_password runs on the threadpool, hence the lock.
+_verify_cache = TTLCache(maxsize=2048, ttl=60)
+_verify_lock = threading.Lock()
+
+# Authenticated user docs by user id, so repeat requests within the TTL skip Mongo.
+# The cache is per process: admin updates evict the entry only in the worker that served them.
+# Other workers are evicted by the user change stream (watch_users), which needs a replica set;
+# without one they can serve the old is_approved / id_verified for up to the 30 s TTL.
+_user_cache = TTLCache(maxsize=10_000, ttl=30)
+
+# Verified JWT payloads by token digest; a hit past the token's exp is treated as a miss
+_token_cache = LRUCache(maxsize=10_000)
+
+# In-memory copy of the user collection for /admin/users, kept current by a change stream.
+# Only served while the stream is live; otherwise the endpoint queries Mongo.
+_users_mirror: dict = {}
+_users_mirror_ready = False
+_users_mirror_loads = 0
+_users_watch_task = None
+
+# Multi-document transactions need a replica set or mongos; detected once at startup
+_transactions_supported = False
+
+# Storage-only fields (lookup keys, lowercased copies, secrets) kept out of API responses
+PUBLIC_PROJECTION = {"_id_str": 0}
+LISTING_PUBLIC_PROJECTION = {"_id_str": 0, "title_lower": 0}
+USER_PUBLIC_PROJECTION = {"_id_str": 0, "email_lower": 0, "password_hash": 0}
+
+def _orjson_default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError
+
+# List endpoints return this directly so raw Mongo documents skip jsonable_encoder
+class MongoJSONResponse(ORJSONResponse):
+    """orjson responses that also tolerate stray ObjectIds; naive datetimes are emitted as UTC"""
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NAIVE_UTC)
+
+app = FastAPI(title="Takuezy Housing API", default_response_class=MongoJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -64,10 +128,40 @@ class PaymentInit(BaseModel):
 # Auth utils
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    if PWD_SCHEME == "argon2":
+        return argon2_hasher.hash(password)
+    # bcrypt only uses the first 72 bytes; truncate explicitly as passlib did
+    return bcrypt.hashpw(password.encode()[:72], bcrypt.gensalt(BCRYPT_ROUNDS)).decode()
+
+def _check_password(password: str, password_hash: str) -> bool:
+    if password_hash.startswith("$argon2"):
+        try:
+            return argon2_hasher.verify(password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    if password_hash.startswith("$2"):
+        try:
+            return bcrypt.checkpw(password.encode()[:72], password_hash.encode())
+        except ValueError:
+            # Malformed bcrypt hash ("Invalid salt")
+            return False
+    return False
+
+def password_needs_rehash(password_hash: str) -> bool:
+    if PWD_SCHEME == "argon2":
+        return not password_hash.startswith("$argon2") or argon2_hasher.check_needs_rehash(password_hash)
+    return not password_hash.startswith("$2")
 
 def verify_password(password: str, password_hash: str) -> bool:
-    return pwd_context.verify(password, password_hash)
+    key = hmac.new(JWT_SECRET.encode(), password.encode() + b"\0" + password_hash.encode(), "sha256").digest()
+    with _verify_lock:
+        cached = _verify_cache.get(key)
+    if cached is not None:
+        return cached
+    result = _check_password(password, password_hash)
+    with _verify_lock:
+        _verify_cache[key] = result
+    return result
 
 def create_token(data: dict, expires_minutes: int = 60 * 24):
     to_encode = data.copy()
@@ -75,29 +169,206 @@ def create_token(data: dict, expires_minutes: int = 60 * 24):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALG)
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+def decode_token(token: str) -> dict:
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    payload = _token_cache.get(key)
+    if payload is not None and payload.get("exp", 0) > time.time():
+        return payload
+    payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
+    _token_cache[key] = payload
+    return payload
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
+        payload = decode_token(token)
         user_id = payload.get("sub")
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token")
-        user = db["user"].find_one({"_id": ObjectId(user_id)})
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
+        user = _user_cache.get(user_id)
+        if user is None:
+            user = await db["user"].find_one({"_id_str": user_id}, projection={"password_hash": 0})
+            if not user:
+                raise HTTPException(status_code=401, detail="User not found")
+            _user_cache[user_id] = user
         return user
     except Exception:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
 
+# Resource lookups
+
+async def find_listing(listing_id: str, projection: dict) -> dict:
+    listing = await db["listing"].find_one({"_id_str": listing_id}, projection=projection)
+    if not listing:
+        raise HTTPException(status_code=404, detail="Listing not found")
+    return listing
+
+def ensure_owner(listing: dict, current: dict):
+    if str(listing["owner_id"]) != str(current["_id"]) and current.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+async def owner_of_listing(listing_id: str, current=Depends(get_current_user)) -> dict:
+    listing = await find_listing(listing_id, {"owner_id": 1})
+    ensure_owner(listing, current)
+    return listing
+
+# Startup
+@app.on_event("startup")
+def check_jwt_backend():
+    # Round-trip a dummy token so a drifting JWT backend fails at boot, not on first login
+    token = create_token({"sub": "selfcheck"}, expires_minutes=1)
+    payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
+    if payload.get("sub") != "selfcheck":
+        raise RuntimeError("JWT backend self-check failed")
+
+@app.on_event("startup")
+async def warm_password_hashing():
+    # Pay one-off KDF setup (argon2 memory allocation, first bcrypt round) before the first login
+    await run_in_threadpool(lambda: _check_password("warmup", hash_password("warmup")))
+
+@app.on_event("startup")
+async def detect_transaction_support():
+    global _transactions_supported
+    if db is None:
+        return
+    hello = await db.client.admin.command("hello")
+    _transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+
+async def _create_unique_index(collection: str, field: str, **kwargs):
+    # Existing duplicates would fail the build; log them and leave the field unindexed instead
+    # of taking startup down with it
+    dupes = await db[collection].aggregate([
+        {"$match": kwargs.get("partialFilterExpression", {})},
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": 20},
+    ]).to_list(length=None)
+    if dupes:
+        logger.warning(
+            "Skipping unique index on %s.%s, duplicate values: %s",
+            collection, field, ", ".join(f"{d['_id']!r} ({d['count']})" for d in dupes),
+        )
+        return
+    try:
+        await db[collection].create_index(field, unique=True, **kwargs)
+    except OperationFailure as e:
+        logger.warning("Could not build unique index on %s.%s: %s", collection, field, e)
+
+@app.on_event("startup")
+async def ensure_indexes():
+    if db is None:
+        return
+    # Weighted text index backing the `q` search on listings
+    await db["listing"].create_index(
+        [("title", "text"), ("description", "text"), ("facilities", "text")],
+        weights={"title": 10, "description": 5, "facilities": 3},
+        name="listing_text",
+    )
+    # Lowercased copies for anchored prefix / case-insensitive exact lookups
+    await db["listing"].create_index("title_lower")
+    # Hot filter shapes, ordered Equality -> Sort -> Range
+    await db["listing"].create_index([("is_available", 1), ("property_type", 1), ("price", 1)])
+    await db["listing"].create_index("owner_id")
+    await db["application"].create_index([("tenant_id", 1), ("status", 1)])
+    await db["application"].create_index("listing_id")
+    await db["payment"].create_index("tenant_id")
+    await db["payment"].create_index("owner_id")
+    # Uniqueness only applies to real strings: phone is stored as null on older documents and
+    # email_lower is absent when there is no email. Email is unique case-insensitively; the
+    # unique index is created after the email_lower backfill below.
+    await _create_unique_index("user", "phone", partialFilterExpression={"phone": {"$type": "string"}})
+    await _create_unique_index("user", "national_id")
+    # String ids let lookups skip ObjectId parsing; backfill older documents first
+    for col in ("user", "listing", "application", "payment", "receipt"):
+        await db[col].update_many(
+            {"_id_str": {"$exists": False}},
+            [{"$set": {"_id_str": {"$toString": "$_id"}}}],
+        )
+        # Copied from the unique _id, so no duplicate scan is needed
+        try:
+            await db[col].create_index("_id_str", unique=True)
+        except OperationFailure as e:
+            logger.warning("Could not build unique index on %s._id_str: %s", col, e)
+    # Backfill documents written before the lowercased fields existed
+    await db["listing"].update_many(
+        {"title_lower": {"$exists": False}},
+        [{"$set": {"title_lower": {"$toLower": "$title"}}}],
+    )
+    await db["user"].update_many(
+        {"email": {"$type": "string"}, "email_lower": {"$exists": False}},
+        [{"$set": {"email_lower": {"$toLower": "$email"}}}],
+    )
+    await _create_unique_index("user", "email_lower", partialFilterExpression={"email_lower": {"$type": "string"}})
+
+async def _follow_users_stream():
+    global _users_mirror_ready, _users_mirror_loads
+    async with db["user"].watch(full_document="updateLookup") as stream:
+        # Load only after the stream is open so no change in between is missed
+        users = await db["user"].find({}, projection=USER_PUBLIC_PROJECTION).to_list(length=None)
+        _users_mirror.clear()
+        _users_mirror.update({u["_id"]: u for u in users})
+        _users_mirror_ready = True
+        _users_mirror_loads += 1
+        try:
+            async for change in stream:
+                if "documentKey" not in change:
+                    # drop/rename/invalidate end the stream; reopen it
+                    return
+                user_id = change["documentKey"]["_id"]
+                _user_cache.pop(user_id, None)
+                user = change.get("fullDocument")
+                if change["operationType"] == "delete" or user is None:
+                    _users_mirror.pop(user_id, None)
+                else:
+                    for field in USER_PUBLIC_PROJECTION:
+                        user.pop(field, None)
+                    _users_mirror[user_id] = user
+        finally:
+            # However the stream ends the mirror is stale from here on
+            _users_mirror_ready = False
+
+async def watch_users():
+    delay = 1
+    while True:
+        loads = _users_mirror_loads
+        error = None
+        try:
+            await _follow_users_stream()
+        except Exception as e:
+            # Mostly transient network errors, but also e.g. a change that fails to decode;
+            # keep retrying either way and let list_users query Mongo until the stream is back
+            error = e
+        if _users_mirror_loads != loads:
+            # The stream had been up, so back off from the start again
+            delay = 1
+        if isinstance(error, PyMongoError):
+            logger.warning("User change stream failed, retrying in %ss: %s", delay, error)
+        elif error is not None:
+            logger.error("User change stream crashed, retrying in %ss", delay, exc_info=error)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 60)
+
+@app.on_event("startup")
+async def start_users_mirror():
+    global _users_watch_task
+    # Change streams have the same replica set / mongos requirement as transactions
+    if db is not None and _transactions_supported:
+        _users_watch_task = asyncio.create_task(watch_users())
+
+@app.on_event("shutdown")
+async def stop_users_mirror():
+    if _users_watch_task is not None:
+        _users_watch_task.cancel()
+
 @app.get("/")
-def root():
+async def root():
     return {"message": "Hello from FastAPI Backend!"}
 
 @app.get("/api/hello")
-def hello():
+async def hello():
     return {"message": "Hello from the backend API!"}
 
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -114,7 +385,7 @@ def test_database():
             response["database_name"] = db.name if hasattr(db, 'name') else "✅ Connected"
             response["connection_status"] = "Connected"
             try:
-                collections = db.list_collection_names()
+                collections = await db.list_collection_names()
                 response["collections"] = collections[:10]
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
@@ -130,16 +401,15 @@ def test_database():
 
 # Auth endpoints
 @app.post("/auth/register", response_model=Token)
-def register(body: RegisterRequest):
+async def register(body: RegisterRequest):
     if not body.email and not body.phone:
         raise HTTPException(status_code=400, detail="Email or phone required")
-    existing = db["user"].find_one({
-        "$or": [
-            {"email": body.email} if body.email else {},
-            {"phone": body.phone} if body.phone else {},
-            {"national_id": body.national_id}
-        ]
-    })
+    conds = [{"national_id": body.national_id}]
+    if body.email:
+        conds.append({"email_lower": body.email.lower()})
+    if body.phone:
+        conds.append({"phone": body.phone})
+    existing = await db["user"].find_one({"$or": conds}, projection={"_id": 1})
     if existing:
         raise HTTPException(status_code=400, detail="User already exists")
 
@@ -149,32 +419,43 @@ def register(body: RegisterRequest):
         email=body.email,
         phone=body.phone,
         national_id=body.national_id,
-        password_hash=hash_password(body.password),
-    ).model_dump()
+        password_hash=await run_in_threadpool(hash_password, body.password),
+    ).model_dump(exclude_none=True)
+    if body.email:
+        user_doc["email_lower"] = body.email.lower()
 
-    user_id = create_document("user", user_doc)
+    try:
+        user_id = await create_document("user", user_doc)
+    except DuplicateKeyError:
+        # The unique indexes are authoritative if a concurrent registration won the race
+        raise HTTPException(status_code=400, detail="User already exists")
     token = create_token({"sub": user_id})
     return Token(access_token=token)
 
 @app.post("/auth/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     identifier = form_data.username
     password = form_data.password
-    user = db["user"].find_one({
+    user = await db["user"].find_one({
         "$or": [
-            {"email": identifier},
+            {"email_lower": identifier.lower()},
             {"phone": identifier},
             {"national_id": identifier}
         ]
-    })
-    if not user or not verify_password(password, user.get("password_hash", "")):
+    }, projection={"password_hash": 1})
+    # Password KDFs are CPU-bound by design; keep them off the event loop
+    if not user or not await run_in_threadpool(verify_password, password, user.get("password_hash", "")):
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    # Migrate the stored hash to the configured scheme on successful login
+    if password_needs_rehash(user["password_hash"]):
+        new_hash = await run_in_threadpool(hash_password, password)
+        await db["user"].update_one({"_id_str": user["_id"]}, {"$set": {"password_hash": new_hash, "updated_at": datetime.now(timezone.utc)}})
     token = create_token({"sub": str(user["_id"])})
     return Token(access_token=token)
 
 # Listings
 @app.post("/listings")
-def create_listing(body: ListingCreate, current=Depends(get_current_user)):
+async def create_listing(body: ListingCreate, current=Depends(get_current_user)):
     if current.get("role") not in ["landlord", "lodge_owner", "admin"]:
         raise HTTPException(status_code=403, detail="Only owners can create listings")
     listing = Listing(
@@ -188,12 +469,13 @@ def create_listing(body: ListingCreate, current=Depends(get_current_user)):
         media_urls=body.media_urls,
         location=body.location,  # validated as dict here
         is_available=body.is_available
-    ).model_dump()
-    listing_id = create_document("listing", listing)
+    ).model_dump(exclude_none=True)
+    listing["title_lower"] = body.title.lower()
+    listing_id = await create_document("listing", listing)
     return {"id": listing_id}
 
-@app.get("/listings")
-def search_listings(
+@app.get("/listings", response_model=None)
+async def search_listings(
     q: Optional[str] = None,
     property_type: Optional[str] = None,
     min_price: Optional[float] = None,
@@ -213,83 +495,82 @@ def search_listings(
             price_filter["$lte"] = max_price
         filters["price"] = price_filter
     if q:
-        filters["$or"] = [
-            {"title": {"$regex": q, "$options": "i"}},
-            {"description": {"$regex": q, "$options": "i"}},
-            {"facilities": {"$elemMatch": {"$regex": q, "$options": "i"}}}
-        ]
-    results = get_documents("listing", filters, limit=100)
-    for r in results:
-        r["_id"] = str(r["_id"])
-    return {"items": results}
+        filters["$text"] = {"$search": q}
+        # Sorting on textScore does not require projecting it, so the score stays out of the response
+        cursor = db["listing"].find(filters, LISTING_PUBLIC_PROJECTION).sort([("score", {"$meta": "textScore"})]).limit(100)
+        results = await cursor.to_list(length=100)
+        if not results:
+            # Text search only matches whole words; fall back to an indexed title prefix match.
+            # Facilities are matched through the text index alone.
+            del filters["$text"]
+            term = " ".join(q.lower().split())
+            filters["title_lower"] = {"$regex": f"^{re.escape(term)}"}
+            results = await get_documents("listing", filters, limit=100, projection=LISTING_PUBLIC_PROJECTION)
+    else:
+        results = await get_documents("listing", filters, limit=100, projection=LISTING_PUBLIC_PROJECTION)
+    return MongoJSONResponse({"items": results})
 
 @app.patch("/listings/{listing_id}/availability")
-def update_availability(listing_id: str, is_available: bool, current=Depends(get_current_user)):
-    listing = db["listing"].find_one({"_id": ObjectId(listing_id)})
-    if not listing:
-        raise HTTPException(status_code=404, detail="Listing not found")
-    if str(listing["owner_id"]) != str(current["_id"]) and current.get("role") != "admin":
-        raise HTTPException(status_code=403, detail="Not allowed")
-    db["listing"].update_one({"_id": ObjectId(listing_id)}, {"$set": {"is_available": is_available, "updated_at": datetime.now(timezone.utc)}})
+async def update_availability(listing_id: str, is_available: bool, listing=Depends(owner_of_listing)):
+    await db["listing"].update_one({"_id_str": listing_id}, {"$set": {"is_available": is_available, "updated_at": datetime.now(timezone.utc)}})
     return {"success": True}
 
 # Applications
 @app.post("/applications")
-def apply(body: ApplicationCreate, current=Depends(get_current_user)):
+async def apply(body: ApplicationCreate, current=Depends(get_current_user)):
     if current.get("role") not in ["tenant", "admin"]:
         raise HTTPException(status_code=403, detail="Only tenants can apply")
-    listing = db["listing"].find_one({"_id": ObjectId(body.listing_id)})
-    if not listing:
-        raise HTTPException(status_code=404, detail="Listing not found")
-    app_doc = Application(
+    await find_listing(body.listing_id, {"_id": 1})
+    # Every field comes from the already-validated request body, so skip re-validation
+    app_doc = Application.model_construct(
         listing_id=body.listing_id,
         tenant_id=str(current["_id"]),
         message=body.message,
         national_id=body.national_id,
-    ).model_dump()
-    app_id = create_document("application", app_doc)
+    ).model_dump(exclude_none=True)
+    app_id = await create_document("application", app_doc)
     return {"id": app_id}
 
 @app.post("/applications/{application_id}/approve")
-def approve_application(application_id: str, approve: bool = True, current=Depends(get_current_user)):
-    application = db["application"].find_one({"_id": ObjectId(application_id)})
+async def approve_application(application_id: str, approve: bool = True, current=Depends(get_current_user)):
+    application = await db["application"].find_one({"_id_str": application_id}, projection={"listing_id": 1})
     if not application:
         raise HTTPException(status_code=404, detail="Application not found")
-    listing = db["listing"].find_one({"_id": ObjectId(application["listing_id"])})
-    if not listing:
-        raise HTTPException(status_code=404, detail="Listing not found")
-    if str(listing["owner_id"]) != str(current["_id"]) and current.get("role") != "admin":
-        raise HTTPException(status_code=403, detail="Not allowed")
-    db["application"].update_one({"_id": ObjectId(application_id)}, {"$set": {"status": "approved" if approve else "rejected", "updated_at": datetime.now(timezone.utc)}})
+    listing = await find_listing(application["listing_id"], {"owner_id": 1})
+    ensure_owner(listing, current)
+    await db["application"].update_one({"_id_str": application_id}, {"$set": {"status": "approved" if approve else "rejected", "updated_at": datetime.now(timezone.utc)}})
     return {"success": True}
 
 # Convenience lists for dashboards
-@app.get("/applications/me")
-def my_applications(current=Depends(get_current_user)):
+@app.get("/applications/me", response_model=None)
+async def my_applications(current=Depends(get_current_user)):
     cur_id = str(current["_id"])
-    items = get_documents("application", {"tenant_id": cur_id}, limit=200)
-    for it in items:
-        it["_id"] = str(it["_id"])
-    return {"items": items}
+    items = await get_documents("application", {"tenant_id": cur_id}, limit=200, projection=PUBLIC_PROJECTION)
+    return MongoJSONResponse({"items": items})
 
-@app.get("/applications/for-me")
-def applications_for_me(current=Depends(get_current_user)):
+@app.get("/applications/for-me", response_model=None)
+async def applications_for_me(current=Depends(get_current_user)):
     cur_id = str(current["_id"])  # owner
-    # Find listings by this owner, then applications referencing them
-    listing_ids = [str(l["_id"]) for l in get_documents("listing", {"owner_id": cur_id}, limit=500)]
-    items = get_documents("application", {"listing_id": {"$in": listing_ids}}, limit=200)
-    for it in items:
-        it["_id"] = str(it["_id"])
-    return {"items": items}
+    # Join this owner's listings to their applications server-side in one round trip.
+    # Applications store listing_id as the listing's _id_str.
+    pipeline = [
+        {"$match": {"owner_id": cur_id}},
+        {"$project": {"_id_str": 1}},
+        {"$lookup": {"from": "application", "localField": "_id_str", "foreignField": "listing_id", "as": "apps"}},
+        {"$unwind": "$apps"},
+        {"$replaceRoot": {"newRoot": "$apps"}},
+        {"$project": PUBLIC_PROJECTION},
+        {"$limit": 200},
+    ]
+    items = await db["listing"].aggregate(pipeline).to_list(length=200)
+    return MongoJSONResponse({"items": items})
 
 # Payments (mock integration with 95/5 split)
 @app.post("/payments/init")
-def init_payment(body: PaymentInit, current=Depends(get_current_user)):
+async def init_payment(body: PaymentInit, current=Depends(get_current_user)):
     if current.get("role") not in ["tenant", "admin"]:
         raise HTTPException(status_code=403, detail="Only tenants can pay")
-    listing = db["listing"].find_one({"_id": ObjectId(body.listing_id)})
-    if not listing:
-        raise HTTPException(status_code=404, detail="Listing not found")
+    listing = await find_listing(body.listing_id, {"price": 1, "owner_id": 1})
     owner_id = listing["owner_id"]
 
     # Calculate split
@@ -297,6 +578,10 @@ def init_payment(body: PaymentInit, current=Depends(get_current_user)):
     platform_fee = round(amount * 0.05, 2)
     owner_amount = round(amount - platform_fee, 2)
 
+    # Both ids are known up front, so the payment can reference its receipt without a follow-up update
+    payment_oid, receipt_oid = ObjectId(), ObjectId()
+    payment_id, receipt_id = str(payment_oid), str(receipt_oid)
+
     payment = Payment(
         listing_id=str(listing["_id"]),
         tenant_id=str(current["_id"]),
@@ -306,59 +591,70 @@ def init_payment(body: PaymentInit, current=Depends(get_current_user)):
         platform_fee=platform_fee,
         owner_amount=owner_amount,
         status="successful",  # mock success
-        receipt_id=None,
-    ).model_dump()
-    payment_id = create_document("payment", payment)
+        receipt_id=receipt_id,
+    ).model_dump(exclude_none=True)
+    payment["_id"] = payment_oid
+
+    receipt = {"_id": receipt_oid, "payment_id": payment_id, "total": amount, "owner_amount": owner_amount, "platform_fee": platform_fee, "payee_phone": os.getenv("PLATFORM_PHONE", "+263 778 864 239"), "reference": f"TAK-{payment_id[:6].upper()}"}
 
-    receipt = {"payment_id": payment_id, "total": amount, "owner_amount": owner_amount, "platform_fee": platform_fee, "payee_phone": os.getenv("PLATFORM_PHONE", "+263 778 864 239"), "reference": f"TAK-{payment_id[:6].upper()}"}
-    receipt_id = create_document("receipt", receipt)
+    # Receipt first: if the second insert fails without a transaction, the leftover is an
+    # unreferenced receipt rather than a payment pointing at a missing one
+    async def write_payment(session):
+        await create_document("receipt", receipt, session=session)
+        await create_document("payment", payment, session=session)
 
-    # Link receipt to payment
-    db["payment"].update_one({"_id": ObjectId(payment_id)}, {"$set": {"receipt_id": receipt_id}})
+    if _transactions_supported:
+        # Atomic, though still one round trip per insert plus the commit
+        async with await db.client.start_session() as session:
+            await session.with_transaction(write_payment)
+    else:
+        await write_payment(None)
 
     return {"payment_id": payment_id, "receipt_id": receipt_id, "owner_amount": owner_amount, "platform_fee": platform_fee}
 
-@app.get("/payments/me")
-def my_payments(current=Depends(get_current_user)):
+@app.get("/payments/me", response_model=None)
+async def my_payments(current=Depends(get_current_user)):
     cur_id = str(current["_id"])  # tenant
-    items = get_documents("payment", {"tenant_id": cur_id}, limit=200)
-    for it in items:
-        it["_id"] = str(it["_id"])        
-    return {"items": items}
+    items = await get_documents("payment", {"tenant_id": cur_id}, limit=200, projection=PUBLIC_PROJECTION)
+    return MongoJSONResponse({"items": items})
 
-@app.get("/payments/for-me")
-def payments_for_me(current=Depends(get_current_user)):
+@app.get("/payments/for-me", response_model=None)
+async def payments_for_me(current=Depends(get_current_user)):
     cur_id = str(current["_id"])  # owner
-    items = get_documents("payment", {"owner_id": cur_id}, limit=200)
-    for it in items:
-        it["_id"] = str(it["_id"])        
-    return {"items": items}
+    items = await get_documents("payment", {"owner_id": cur_id}, limit=200, projection=PUBLIC_PROJECTION)
+    return MongoJSONResponse({"items": items})
 
 # Admin actions
-@app.get("/admin/users")
-def list_users(current=Depends(get_current_user)):
+@app.get("/admin/users", response_model=None)
+async def list_users(current=Depends(get_current_user)):
     if current.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Admin only")
-    users = get_documents("user", {}, limit=200)
-    for u in users:
-        u["_id"] = str(u["_id"])        
-    return {"items": users}
+    if _users_mirror_ready:
+        users = list(itertools.islice(_users_mirror.values(), 200))
+    else:
+        users = await get_documents("user", {}, limit=200, projection=USER_PUBLIC_PROJECTION)
+    return MongoJSONResponse({"items": users})
 
 @app.post("/admin/users/{user_id}/approve")
-def approve_user(user_id: str, approve: bool = True, current=Depends(get_current_user)):
+async def approve_user(user_id: str, approve: bool = True, current=Depends(get_current_user)):
     if current.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Admin only")
-    db["user"].update_one({"_id": ObjectId(user_id)}, {"$set": {"is_approved": bool(approve), "updated_at": datetime.now(timezone.utc)}})
+    await db["user"].update_one({"_id_str": user_id}, {"$set": {"is_approved": bool(approve), "updated_at": datetime.now(timezone.utc)}})
+    _user_cache.pop(user_id, None)  # this worker only; see _user_cache
     return {"success": True}
 
 @app.post("/admin/users/{user_id}/verify-id")
-def verify_id(user_id: str, verified: bool = True, current=Depends(get_current_user)):
+async def verify_id(user_id: str, verified: bool = True, current=Depends(get_current_user)):
     if current.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Admin only")
-    db["user"].update_one({"_id": ObjectId(user_id)}, {"$set": {"id_verified": bool(verified), "updated_at": datetime.now(timezone.utc)}})
+    await db["user"].update_one({"_id_str": user_id}, {"$set": {"id_verified": bool(verified), "updated_at": datetime.now(timezone.utc)}})
+    _user_cache.pop(user_id, None)  # this worker only; see _user_cache
     return {"success": True}
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+    # Workers require an import string; uvloop/httptools replace the pure-Python loop and parser.
+    # Caches are per worker, so cross-worker user eviction relies on the change stream.
+    uvicorn.run("main:app", host="0.0.0.0", port=port, loop="uvloop", http="httptools", workers=workers)